@@ -1,13 +1,24 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, JSONResponse
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 import sqlite3
 import hashlib
 from datetime import datetime, timedelta
+import json
+import itertools
 import math
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; distances fall back to plain NumPy
+    njit = None
 
 app = FastAPI(title="Blood Donor Alert Platform", version="1.0.0")
 
@@ -20,9 +31,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+FETCH_CHUNK_SIZE = 4096  # Candidate donors ranked per batch
+
+SMS_WORKERS = 16  # Notifications sent concurrently per process
+
+URGENCY_EMOJI = {"low": "🟢", "medium": "🟡", "high": "🔴", "critical": "🚨"}
+
+DB_PATH = 'blood_donor.db'
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',  # Readers no longer block the writer
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',  # 64 MiB page cache
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+)
+
 # Database setup
+def add_missing_columns(cursor, table, columns):
+    """Add any of the {name: declaration} columns that an existing table lacks"""
+    existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    for name, declaration in columns.items():
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {declaration}')
+
+def donor_trig(lat, lon):
+    """Return the (lat_rad, lon_rad, cos_lat) values stored for a donor"""
+    lat_rad = math.radians(lat)
+    return lat_rad, math.radians(lon), math.cos(lat_rad)
+
 def init_db():
-    conn = sqlite3.connect('blood_donor.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     # Donors table
@@ -45,10 +83,25 @@ def init_db():
         last_donation DATE,
         receive_notifications BOOLEAN DEFAULT 1,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        is_active BOOLEAN DEFAULT 1
+        is_active BOOLEAN DEFAULT 1,
+        lat_rad REAL,
+        lon_rad REAL,
+        cos_lat REAL
     )
     ''')
     
+    # Donor coordinates never change, so the radians and cos(latitude) used
+    # by the haversine are stored once instead of recomputed per request.
+    add_missing_columns(cursor, 'donors', {
+        'lat_rad': 'REAL',
+        'lon_rad': 'REAL',
+        'cos_lat': 'REAL',
+    })
+    cursor.execute('SELECT id, latitude, longitude FROM donors WHERE cos_lat IS NULL')
+    cursor.executemany('UPDATE donors SET lat_rad = ?, lon_rad = ?, cos_lat = ? WHERE id = ?', [
+        (*donor_trig(latitude, longitude), donor_id) for donor_id, latitude, longitude in cursor.fetchall()
+    ])
+    
     # Hospitals table
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS hospitals (
@@ -103,7 +156,38 @@ def init_db():
         FOREIGN KEY (donor_id) REFERENCES donors (id)
     )
     ''')
-    
+
+    # Indexes for the hot lookups
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_donors_bt_active ON donors(blood_type, is_active)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_br_hospital_created ON blood_requests(hospital_id, created_at DESC)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_dr_request ON donor_responses(request_id, response)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_dr_donor ON donor_responses(donor_id)
+    ''')
+
+    # One row per response with the request and donor fields the dashboard
+    # shows (requests without responses appear once with NULL donor fields).
+    # Recreated on startup so it always matches this definition.
+    cursor.execute('DROP VIEW IF EXISTS request_response_view')
+    cursor.execute('''
+    CREATE VIEW request_response_view AS
+    SELECT br.hospital_id, br.id AS req_id, br.blood_type, br.units_needed, br.urgency, br.created_at,
+           d.name AS donor_name, d.phone AS donor_phone, d.blood_type AS donor_bt,
+           dr.response, dr.responded_at, dr.id AS response_id
+    FROM blood_requests br
+    LEFT JOIN donor_responses dr ON dr.request_id = br.id
+    LEFT JOIN donors d ON d.id = dr.donor_id
+    ''')
+
+    # Refresh planner statistics so the indexes above get picked
+    cursor.execute('ANALYZE')
+
     conn.commit()
     conn.close()
 
@@ -129,6 +213,8 @@ class DonorRegistration(BaseModel):
     receive_notifications: bool = True
 
 class HospitalRegistration(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     name: str = Field(alias='hospitalName')
     reg_no: str = Field(alias='hospitalRegNo')
     hospital_type: str = Field(alias='hospitalType')
@@ -161,34 +247,147 @@ class DonorResponse(BaseModel):
     donor_id: int
     response: str  # "available", "not_available"
 
+# Response models; with a response_model set, FastAPI has Pydantic
+# serialize the result straight to JSON bytes
+class DonorRegistered(BaseModel):
+    message: str
+    donor_id: int
+
+class HospitalRegistered(BaseModel):
+    message: str
+    hospital_id: int
+
+class BloodRequestCreated(BaseModel):
+    message: str
+    request_id: int
+    notified_donors: List[str]
+    not_selected_donors: List[str]
+
+class ResponseRecorded(BaseModel):
+    message: str
+
+class DashboardDonor(BaseModel):
+    name: str
+    phone: str
+    blood_type: str
+    response: str
+
+class DashboardRequest(BaseModel):
+    request_id: int
+    blood_type: str
+    units_needed: int
+    urgency: str
+    available_donors_count: int
+    notified_donors: List[DashboardDonor]
+    not_selected_donors: List[DashboardDonor]
+
+class HospitalDashboard(BaseModel):
+    hospital_name: str
+    requests: List[DashboardRequest]
+
 # Utility functions
-def get_db():
-    conn = sqlite3.connect('blood_donor.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+class ConnectionPool:
+    """Hands out one long-lived SQLite connection per thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points in kilometers"""
+    def _connect(self):
+        # Autocommit mode: multi-statement writes open their own transaction()
+        # Rows come back as plain tuples and are unpacked by position
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def acquire(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        yield conn
+
+pool = ConnectionPool(DB_PATH)
+
+@contextmanager
+def transaction(conn):
+    """Run the enclosed statements as one write transaction"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except BaseException:
+        # A failed COMMIT (e.g. SQLITE_BUSY) leaves the transaction open on
+        # this thread's pooled connection; some errors already rolled it back
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+
+if njit is not None:
+    # Not parallel=True: endpoints already run on FastAPI's worker threads,
+    # and nesting Numba's thread pool inside them oversubscribes the cores.
+    @njit(fastmath=True, cache=True)
+    def haversine_kernel(lat_rad, lon_rad, cos_lat, lats_rad, lons_rad, cos_lats, out):
+        """Compiled haversine loop behind haversine_batch"""
+        for i in range(lats_rad.shape[0]):
+            a = math.sin((lats_rad[i] - lat_rad) / 2) ** 2 + cos_lat * cos_lats[i] * math.sin((lons_rad[i] - lon_rad) / 2) ** 2
+            out[i] = 2 * 6371 * math.asin(math.sqrt(a))
+else:
+    haversine_kernel = None
+
+def haversine_batch(lat, lon, lats_rad, lons_rad, cos_lats):
+    """Haversine distances in kilometers from one point to donors' donor_trig values"""
     R = 6371  # Earth's radius in kilometers
 
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
+    lat_rad = math.radians(lat)
+    lon_rad = math.radians(lon)
+
+    if haversine_kernel is not None:
+        out = np.empty(len(lats_rad))
+        haversine_kernel(lat_rad, lon_rad, math.cos(lat_rad), lats_rad, lons_rad, cos_lats, out)
+        return out
 
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
+    dlat = lats_rad - lat_rad
+    dlon = lons_rad - lon_rad
 
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat_rad) * cos_lats * np.sin(dlon / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(a))
 
-    return R * c
+def fetch_distances(cursor, lat, lon):
+    """Yield (rows, distances to (lat, lon)) for FETCH_CHUNK_SIZE chunks of a candidate cursor"""
+    while True:
+        chunk = cursor.fetchmany(FETCH_CHUNK_SIZE)
+        if not chunk:
+            return
+
+        # Rows are (id, name, phone, lat_rad, lon_rad, cos_lat)
+        lats_rad, lons_rad, cos_lats = np.array([row[3:] for row in chunk], dtype=np.float64).T
+        yield chunk, haversine_batch(lat, lon, lats_rad, lons_rad, cos_lats)
+
+def rank_all_donors(cursor, lat, lon):
+    """Return a candidate cursor's (id, name, phone) donors closest to (lat, lon) first, and their sorted distances"""
+    donors = []
+    distances = []
+    for chunk, chunk_distances in fetch_distances(cursor, lat, lon):
+        donors += [row[:3] for row in chunk]
+        distances.append(chunk_distances)
+    distances = np.concatenate(distances) if distances else np.empty(0)
+
+    # Ties go to the lower id, like the old stable sort of rows in id order
+    order = np.lexsort(([donor_id for donor_id, _, _ in donors], distances))
+    return [donors[i] for i in order], distances[order]
 
 # This function sends a simulated message to the terminal.
 def send_sms(phone, message):
-    print(f"SMS would be sent to {phone}: {message}")
+    # A single write, so lines from concurrent sends don't interleave
+    print(f"SMS would be sent to {phone}: {message}\n", end="")
     return True
 
+# Notifications for one request go out in parallel; with a real gateway
+# (see message.py) the workers share its client's keep-alive connections.
+sms_executor = ThreadPoolExecutor(max_workers=SMS_WORKERS)
+
 # API Endpoints
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -203,195 +402,180 @@ async def root():
     </html>
     """
 
-@app.post("/register/donor")
-async def register_donor(donor: DonorRegistration):
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            INSERT INTO donors (name, phone, email, dob, aadhar, weight, blood_type, address, city, state, pincode, latitude, longitude, last_donation, receive_notifications)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            donor.name, donor.phone, donor.email, donor.dob, donor.aadhar, donor.weight, 
-            donor.blood_type, donor.address, donor.city, donor.state, donor.pincode, 
-            donor.latitude, donor.longitude, donor.last_donation, donor.receive_notifications
-        ))
+@app.post("/register/donor", response_model=DonorRegistered)
+def register_donor(donor: DonorRegistration):
+    with pool.acquire() as conn:
+        cursor = conn.cursor()
         
-        donor_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute('''
+                INSERT INTO donors (name, phone, email, dob, aadhar, weight, blood_type, address, city, state, pincode, latitude, longitude, last_donation, receive_notifications, lat_rad, lon_rad, cos_lat)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                donor.name, donor.phone, donor.email, donor.dob, donor.aadhar, donor.weight, 
+                donor.blood_type, donor.address, donor.city, donor.state, donor.pincode, 
+                donor.latitude, donor.longitude, donor.last_donation, donor.receive_notifications,
+                *donor_trig(donor.latitude, donor.longitude)
+            ))
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=400, detail="Phone or email already registered")
         
-        return {"message": "Donor registered successfully", "donor_id": donor_id}
-    except sqlite3.IntegrityError:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Phone or email already registered")
-
-@app.post("/register/hospital")
-async def register_hospital(hospital: HospitalRegistration):
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            INSERT INTO hospitals (name, reg_no, hospital_type, phone, emergency_phone, email, incharge_name, incharge_phone, num_beds, address, city, state, pincode, latitude, longitude, open_time, close_time, services)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            hospital.name, hospital.reg_no, hospital.hospital_type, hospital.phone, 
-            hospital.emergency_phone, hospital.email, hospital.incharge_name, 
-            hospital.incharge_phone, hospital.num_beds, hospital.address, 
-            hospital.city, hospital.state, hospital.pincode, hospital.latitude, 
-            hospital.longitude, hospital.open_time, hospital.close_time, 
-            str(hospital.services) if hospital.services else None
-        ))
+        return {"message": "Donor registered successfully", "donor_id": cursor.lastrowid}
+
+@app.post("/register/hospital", response_model=HospitalRegistered)
+def register_hospital(hospital: HospitalRegistration):
+    with pool.acquire() as conn:
+        cursor = conn.cursor()
         
-        hospital_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute('''
+                INSERT INTO hospitals (name, reg_no, hospital_type, phone, emergency_phone, email, incharge_name, incharge_phone, num_beds, address, city, state, pincode, latitude, longitude, open_time, close_time, services)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                hospital.name, hospital.reg_no, hospital.hospital_type, hospital.phone, 
+                hospital.emergency_phone, hospital.email, hospital.incharge_name, 
+                hospital.incharge_phone, hospital.num_beds, hospital.address, 
+                hospital.city, hospital.state, hospital.pincode, hospital.latitude, 
+                hospital.longitude, hospital.open_time, hospital.close_time, 
+                str(hospital.services) if hospital.services else None
+            ))
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=400, detail="Phone, registration number, or email already registered")
         
-        return {"message": "Hospital registered successfully", "hospital_id": hospital_id}
-    except sqlite3.IntegrityError:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Phone, registration number, or email already registered")
-
-@app.post("/request/blood")
-async def create_blood_request(request: BloodRequest):
-    conn = get_db()
-    cursor = conn.cursor()
-    
+        return {"message": "Hospital registered successfully", "hospital_id": cursor.lastrowid}
+
+@app.post("/request/blood", response_model=BloodRequestCreated)
+def create_blood_request(request: BloodRequest):
     # Calculate expiry time
     expires_at = datetime.now() + timedelta(hours=request.expires_hours)
     
-    cursor.execute('''
-        INSERT INTO blood_requests (hospital_id, blood_type, units_needed, urgency, message, expires_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (
-        request.hospital_id, request.blood_type, request.units_needed, 
-        request.urgency, request.message, expires_at
-    ))
-    
-    request_id = cursor.lastrowid
-    
-    # Get hospital details
-    cursor.execute('SELECT * FROM hospitals WHERE id = ?', (request.hospital_id,))
-    hospital = cursor.fetchone()
-    
-    if not hospital:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Hospital not found")
-    
-    # --- PRIORITY SCHEDULING LOGIC ---
-    # 1. Find all eligible donors who have the matching blood type
-    cursor.execute('''
-        SELECT * FROM donors 
-        WHERE blood_type = ? AND is_active = 1
-    ''', (request.blood_type,))
-    all_eligible_donors = cursor.fetchall()
-    
-    # 2. Sort donors by distance to the hospital (closest first)
-    donors_with_distance = []
-    for donor in all_eligible_donors:
-        distance = calculate_distance(
-            hospital['latitude'], hospital['longitude'],
-            donor['latitude'], donor['longitude']
-        )
-        donors_with_distance.append({'donor_id': donor['id'], 'distance': distance, 'phone': donor['phone'], 'name': donor['name']})
-    
-    donors_with_distance.sort(key=lambda x: x['distance'])
-    
-    # 3. Select the top N donors and mark the rest as 'not_selected'
-    top_donors = donors_with_distance[:request.units_needed]
-    all_other_donors = donors_with_distance[request.units_needed:]
-    
-    # 4. Save the responses to the database
-    for top_donor in top_donors:
+    with pool.acquire() as conn, transaction(conn):
+        cursor = conn.cursor()
+        
+        # Get hospital details; a missing hospital is rejected before anything is written
+        cursor.execute('SELECT latitude, longitude, name, phone FROM hospitals WHERE id = ?', (request.hospital_id,))
+        hospital = cursor.fetchone()
+        
+        if not hospital:
+            raise HTTPException(status_code=404, detail="Hospital not found")
+        hospital_lat, hospital_lon, hospital_name, hospital_phone = hospital
+        
         cursor.execute('''
-            INSERT INTO donor_responses (request_id, donor_id, response)
-            VALUES (?, ?, ?)
-        ''', (request_id, top_donor['donor_id'], 'available'))
+            INSERT INTO blood_requests (hospital_id, blood_type, units_needed, urgency, message, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            request.hospital_id, request.blood_type, request.units_needed, 
+            request.urgency, request.message, expires_at
+        ))
         
-        # Simulate sending a notification to the top donors
-        urgency_emoji = {"low": "🟢", "medium": "🟡", "high": "🔴", "critical": "🚨"}
-        message = f"{urgency_emoji.get(request.urgency, '🩸')} URGENT: {hospital['name']} needs {request.blood_type} blood ({request.units_needed} units). Distance: {top_donor['distance']:.1f}km. We've selected you as a top priority. Please contact the hospital at {hospital['phone']}."
-        send_sms(top_donor['phone'], message)
+        request_id = cursor.lastrowid
         
-    for other_donor in all_other_donors:
+        # --- PRIORITY SCHEDULING LOGIC ---
+        # 1. Rank every eligible donor by distance to the hospital, closest
+        #    first. Each of them gets a response row, so one pass over all of
+        #    them serves both the top N and the 'not_selected' list.
         cursor.execute('''
+            SELECT id, name, phone, lat_rad, lon_rad, cos_lat FROM donors
+            WHERE blood_type = ? AND is_active = 1
+        ''', (request.blood_type,))
+        ranked_donors, distances = rank_all_donors(cursor, hospital_lat, hospital_lon)
+
+        # 2. Select the top N donors and mark the rest as 'not_selected'
+        units = max(request.units_needed, 0)
+        top_donors = [
+            {'donor_id': donor_id, 'distance': distance, 'phone': phone, 'name': name}
+            for (donor_id, name, phone), distance in zip(ranked_donors[:units], distances[:units].tolist())
+        ]
+        all_other_donors = ranked_donors[units:]
+
+        # 3. Save all responses to the database in one batch
+        cursor.executemany('''
             INSERT INTO donor_responses (request_id, donor_id, response)
             VALUES (?, ?, ?)
-        ''', (request_id, other_donor['donor_id'], 'not_selected'))
+        ''', itertools.chain(
+            ((request_id, d['donor_id'], 'available') for d in top_donors),
+            ((request_id, donor_id, 'not_selected') for donor_id, _, _ in all_other_donors)
+        ))
+
+    # 4. Simulate sending a notification to the top donors once the request is committed
+    prefix = f"{URGENCY_EMOJI.get(request.urgency, '🩸')} URGENT: {hospital_name} needs {request.blood_type} blood ({request.units_needed} units)."
+    suffix = f"We've selected you as a top priority. Please contact the hospital at {hospital_phone}."
+    sends = [
+        (d['phone'], sms_executor.submit(send_sms, d['phone'], f"{prefix} Distance: {d['distance']:.1f}km. {suffix}"))
+        for d in top_donors
+    ]
+
+    # The request is already saved, so a failed send must not turn into an
+    # error response (a client retry would create a duplicate request)
+    failed_sends = 0
+    for phone, future in sends:
+        try:
+            future.result()
+        except Exception as exc:
+            failed_sends += 1
+            print(f"SMS to {phone} failed: {exc!r}\n", end="")
+
+    message = f"Blood request created successfully. {len(top_donors) - failed_sends} donors notified."
+    if failed_sends:
+        message += f" {failed_sends} notification(s) could not be sent."
 
-    conn.commit()
-    conn.close()
-    
     return {
-        "message": f"Blood request created successfully. {len(top_donors)} donors notified.",
+        "message": message,
         "request_id": request_id,
         "notified_donors": [d['name'] for d in top_donors],
-        "not_selected_donors": [d['name'] for d in all_other_donors]
+        "not_selected_donors": [name for _, name, _ in all_other_donors]
     }
 
-@app.post("/respond")
-async def donor_respond(response: DonorResponse):
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO donor_responses (request_id, donor_id, response)
-        VALUES (?, ?, ?)
-    ''', (response.request_id, response.donor_id, response.response))
-    
-    conn.commit()
-    conn.close()
+@app.post("/respond", response_model=ResponseRecorded)
+def donor_respond(response: DonorResponse):
+    with pool.acquire() as conn:
+        conn.execute('''
+            INSERT INTO donor_responses (request_id, donor_id, response)
+            VALUES (?, ?, ?)
+        ''', (response.request_id, response.donor_id, response.response))
     
     return {"message": "Response recorded successfully"}
 
-@app.get("/dashboard/hospital/{hospital_id}")
-async def hospital_dashboard(hospital_id: int):
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM hospitals WHERE id = ?', (hospital_id,))
-    hospital_data = cursor.fetchone()
-    if not hospital_data:
-        raise HTTPException(status_code=404, detail="Hospital not found")
+@app.get("/dashboard/hospital/{hospital_id}", response_model=HospitalDashboard)
+def hospital_dashboard(hospital_id: int):
+    with pool.acquire() as conn:
+        cursor = conn.cursor()
         
-    cursor.execute('''
-        SELECT br.*, COUNT(CASE WHEN dr.response = 'available' THEN 1 END) as available_responses,
-                     COUNT(CASE WHEN dr.response = 'not_selected' THEN 1 END) as not_selected_responses
-        FROM blood_requests br
-        LEFT JOIN donor_responses dr ON br.id = dr.request_id
-        WHERE br.hospital_id = ?
-        GROUP BY br.id
-        ORDER BY br.created_at DESC
-    ''', (hospital_id,))
-    
-    requests = [dict(row) for row in cursor.fetchall()]
-    
-    response_data = []
-    for req in requests:
+        cursor.execute('SELECT name FROM hospitals WHERE id = ?', (hospital_id,))
+        hospital_data = cursor.fetchone()
+        if not hospital_data:
+            raise HTTPException(status_code=404, detail="Hospital not found")
+            
+        # SQLite groups the responses per request and builds the donor lists
+        # as JSON itself; the ordered subquery keeps them in response order.
         cursor.execute('''
-            SELECT d.name, d.phone, d.blood_type, dr.response
-            FROM donor_responses dr
-            JOIN donors d ON dr.donor_id = d.id
-            WHERE dr.request_id = ?
-            ORDER BY dr.responded_at
-        ''', (req['id'],))
-        
-        donors_for_request = [dict(row) for row in cursor.fetchall()]
-        
-        response_data.append({
-            "request_id": req['id'],
-            "blood_type": req['blood_type'],
-            "units_needed": req['units_needed'],
-            "urgency": req['urgency'],
-            "available_donors_count": req['available_responses'],
-            "notified_donors": [d for d in donors_for_request if d['response'] == 'available'],
-            "not_selected_donors": [d for d in donors_for_request if d['response'] == 'not_selected']
-        })
+            SELECT req_id, blood_type, units_needed, urgency,
+                   COUNT(*) FILTER (WHERE response = 'available') AS available_donors_count,
+                   json_group_array(json_object('name', donor_name, 'phone', donor_phone, 'blood_type', donor_bt, 'response', response))
+                       FILTER (WHERE response = 'available' AND donor_name IS NOT NULL) AS notified_donors,
+                   json_group_array(json_object('name', donor_name, 'phone', donor_phone, 'blood_type', donor_bt, 'response', response))
+                       FILTER (WHERE response = 'not_selected' AND donor_name IS NOT NULL) AS not_selected_donors
+            FROM (
+                SELECT * FROM request_response_view
+                WHERE hospital_id = ?
+                ORDER BY req_id, responded_at, response_id
+            )
+            GROUP BY req_id
+            ORDER BY created_at DESC, req_id
+        ''', (hospital_id,))
+        rows = cursor.fetchall()
     
-    conn.close()
-    return {"hospital_name": hospital_data['name'], "requests": response_data}
+    response_data = [{
+        "request_id": req_id,
+        "blood_type": blood_type,
+        "units_needed": units_needed,
+        "urgency": urgency,
+        "available_donors_count": available_donors_count,
+        "notified_donors": json.loads(notified_donors),
+        "not_selected_donors": json.loads(not_selected_donors)
+    } for req_id, blood_type, units_needed, urgency, available_donors_count, notified_donors, not_selected_donors in rows]
+    
+    return {"hospital_name": hospital_data[0], "requests": response_data}
 
 if __name__ == "__main__":
     import uvicorn
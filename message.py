@@ -1,21 +1,29 @@
+import os
 from twilio.rest import Client
 
 # Twilio credentials
 TWILIO_SID = os.getenv("TWILIO_SID")
 TWILIO_TOKEN = os.getenv("TWILIO_TOKEN")
-client = Client(account_sid, auth_token)
+
+# One client per process, so every message reuses its HTTPS session
+_client = Client(TWILIO_SID, TWILIO_TOKEN)
 
 # WhatsApp message details
 from_whatsapp_number = 'whatsapp:Twilio sandbox number'  # Twilio sandbox number
 to_whatsapp_number = 'whatsapp:Your verified phone number'   # Your verified phone number
 
-message_body = "🩸 URGENT: A hospital near you needs B+ blood . Can you donate? Reply 'Available' or 'Not Available'."
+def send_sms(to, body):
+    """Send a WhatsApp message through the shared Twilio client"""
+    return _client.messages.create(
+        body=body,
+        from_=from_whatsapp_number,
+        to=to
+    )
+
+if __name__ == "__main__":
+    message_body = "🩸 URGENT: A hospital near you needs B+ blood . Can you donate? Reply 'Available' or 'Not Available'."
 
-# Send message
-message = client.messages.create(
-    body=message_body,
-    from_=from_whatsapp_number,
-    to=to_whatsapp_number
-)
+    # Send message
+    message = send_sms(to_whatsapp_number, message_body)
 
-print(f"Message sent! SID: {message.sid}")
\ No newline at end of file
+    print(f"Message sent! SID: {message.sid}")
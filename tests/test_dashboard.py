@@ -0,0 +1,125 @@
+"""Check the hospital dashboard payload through the API"""
+import os
+import sys
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+main = None
+workdir = None
+previous_cwd = None
+
+
+def setUpModule():
+    # main creates and migrates blood_donor.db in the working directory, so
+    # import it and open its connections inside a throwaway directory
+    global main, workdir, previous_cwd
+    previous_cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
+    os.chdir(workdir.name)
+    import main
+    main.init_db()
+    main.pool = main.ConnectionPool(main.DB_PATH)
+    main.send_sms = lambda phone, message: True
+
+
+def tearDownModule():
+    os.chdir(previous_cwd)
+    workdir.cleanup()
+
+
+def hospital(suffix, lat, lon):
+    return {
+        'hospitalName': f'Hospital {suffix}', 'hospitalRegNo': f'REG-{suffix}', 'hospitalType': 'general',
+        'hospitalPhone': f'100-{suffix}', 'hospitalEmergencyPhone': '108', 'hospitalEmail': f'{suffix}@example.com',
+        'bloodBankIncharge': 'incharge', 'inchargePhone': '200', 'hospitalBeds': 50,
+        'hospitalAddress': 'address', 'hospitalCity': 'city', 'hospitalState': 'state', 'hospitalPin': '560001',
+        'hospitalLat': lat, 'hospitalLng': lon, 'hospitalOpenTime': '08:00', 'hospitalCloseTime': '20:00',
+    }
+
+
+def donor(name, blood_type, lat, lon):
+    return {
+        'name': name, 'phone': f'phone-{name}', 'email': f'{name}@example.com', 'dob': '1990-01-01',
+        'aadhar': '0000', 'weight': 60, 'blood_type': blood_type, 'address': 'address', 'city': 'city',
+        'state': 'state', 'pincode': '560001', 'latitude': lat, 'longitude': lon,
+    }
+
+
+def listed(name, blood_type, response):
+    return {'name': name, 'phone': f'phone-{name}', 'blood_type': blood_type, 'response': response}
+
+
+class HospitalDashboardTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def post(self, path, body):
+        response = self.client.post(path, json=body)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_payload(self):
+        hospital_id = self.post('/register/hospital', hospital('A', 12.97, 77.59))['hospital_id']
+        other_id = self.post('/register/hospital', hospital('B', 28.61, 77.20))['hospital_id']
+        donor_ids = {
+            name: self.post('/register/donor', donor(name, blood_type, lat, lon))['donor_id']
+            for name, blood_type, lat, lon in [
+                ('far', 'AB-', 13.50, 77.90),
+                ('near', 'AB-', 12.98, 77.60),
+                ('middle', 'AB-', 13.10, 77.70),
+                ('other type', 'O-', 12.97, 77.59),
+            ]
+        }
+
+        def request(hospital, blood_type, units):
+            body = {'hospital_id': hospital, 'blood_type': blood_type, 'units_needed': units, 'urgency': 'high'}
+            return self.post('/request/blood', body)['request_id']
+
+        first = request(hospital_id, 'AB-', 2)
+        empty = request(hospital_id, 'B-', 1)  # No donors, so no responses
+        last = request(hospital_id, 'AB-', 1)
+        request(other_id, 'AB-', 3)
+
+        # Donor replies: one declines the first request, one volunteers for the last
+        self.post('/respond', {'request_id': first, 'donor_id': donor_ids['far'], 'response': 'not_available'})
+        self.post('/respond', {'request_id': last, 'donor_id': donor_ids['far'], 'response': 'available'})
+
+        # Newest first, whatever the insertion order
+        with main.pool.acquire() as conn:
+            for request_id, created_at in [(first, '2024-01-01 10:00:00'), (empty, '2024-01-01 12:00:00'), (last, '2024-01-01 11:00:00')]:
+                conn.execute('UPDATE blood_requests SET created_at = ? WHERE id = ?', (created_at, request_id))
+
+        response = self.client.get(f'/dashboard/hospital/{hospital_id}')
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json(), {
+            'hospital_name': 'Hospital A',
+            'requests': [
+                {
+                    'request_id': empty, 'blood_type': 'B-', 'units_needed': 1, 'urgency': 'high',
+                    'available_donors_count': 0, 'notified_donors': [], 'not_selected_donors': [],
+                },
+                {
+                    'request_id': last, 'blood_type': 'AB-', 'units_needed': 1, 'urgency': 'high',
+                    'available_donors_count': 2,
+                    'notified_donors': [listed('near', 'AB-', 'available'), listed('far', 'AB-', 'available')],
+                    'not_selected_donors': [listed('middle', 'AB-', 'not_selected'), listed('far', 'AB-', 'not_selected')],
+                },
+                {
+                    'request_id': first, 'blood_type': 'AB-', 'units_needed': 2, 'urgency': 'high',
+                    'available_donors_count': 2,
+                    'notified_donors': [listed('near', 'AB-', 'available'), listed('middle', 'AB-', 'available')],
+                    'not_selected_donors': [listed('far', 'AB-', 'not_selected')],
+                },
+            ],
+        })
+
+    def test_unknown_hospital(self):
+        self.assertEqual(self.client.get('/dashboard/hospital/999999').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
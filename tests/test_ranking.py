@@ -0,0 +1,110 @@
+"""Check the donor ranking against a brute-force haversine sort"""
+import math
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+main = None
+workdir = None
+previous_cwd = None
+
+
+def setUpModule():
+    # main creates and migrates blood_donor.db in the working directory, so
+    # import it and open its connections inside a throwaway directory
+    global main, workdir, previous_cwd
+    previous_cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
+    os.chdir(workdir.name)
+    import main
+    main.init_db()
+    main.pool = main.ConnectionPool(main.DB_PATH)
+
+
+def tearDownModule():
+    os.chdir(previous_cwd)
+    workdir.cleanup()
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distance between two points in kilometers"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+
+def add_donors(conn, blood_type, points):
+    """Insert active donors at the given (lat, lon) points and return {donor_id: (lat, lon)}"""
+    donors = {}
+    for lat, lon in points:
+        cursor = conn.execute('''
+            INSERT INTO donors (name, phone, email, dob, aadhar, weight, blood_type, address, city, state, pincode, latitude, longitude, lat_rad, lon_rad, cos_lat)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            'donor', f'{blood_type}-{len(donors)}', 'e', 'd', 'a', 60, blood_type, 'a', 'c', 's', 'p',
+            lat, lon, *main.donor_trig(lat, lon)
+        ))
+        donors[cursor.lastrowid] = (lat, lon)
+    return donors
+
+
+def rank(conn, blood_type, lat, lon):
+    """Rank a blood type's active donors the way create_blood_request does"""
+    cursor = conn.execute('''
+        SELECT id, name, phone, lat_rad, lon_rad, cos_lat FROM donors
+        WHERE blood_type = ? AND is_active = 1
+    ''', (blood_type,))
+    return main.rank_all_donors(cursor, lat, lon)
+
+
+class RankAllDonorsTest(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(1)
+        points = []
+        for _ in range(3000):
+            mode = rng.random()
+            if mode < 0.3:
+                points.append((rng.uniform(-90, 90), rng.uniform(-180, 180)))
+            elif mode < 0.5:
+                points.append((rng.uniform(80, 90), rng.uniform(-180, 180)))
+            elif mode < 0.7:
+                points.append((rng.uniform(-30, 30), rng.choice([-1, 1]) * rng.uniform(175, 180)))
+            else:
+                points.append((12.9 + rng.gauss(0, 0.5), 77.6 + rng.gauss(0, 0.5)))
+
+        with main.pool.acquire() as conn:
+            donors = add_donors(conn, 'W', points)
+            for lat, lon in [(12.9, 77.6), (89.5, 10.0), (0.0, 179.9), (-45.0, -179.95)]:
+                with self.subTest(lat=lat, lon=lon):
+                    expected = sorted(haversine(lat, lon, *point) for point in donors.values())
+                    ranked, distances = rank(conn, 'W', lat, lon)
+                    self.assertEqual(len(ranked), len(expected))
+                    for (donor_id, _, _), distance, want in zip(ranked, distances, expected):
+                        self.assertAlmostEqual(haversine(lat, lon, *donors[donor_id]), want, places=6)
+                        self.assertAlmostEqual(distance, want, places=6)
+
+    def test_ties_go_to_the_lowest_id(self):
+        rng = random.Random(3)
+        spots = [(12.97, 77.59), (12.98, 77.60), (13.5, 77.0)]
+        with main.pool.acquire() as conn:
+            donors = add_donors(conn, 'T', [rng.choice(spots) for _ in range(600)])
+            expected = sorted(donors, key=lambda donor_id: (haversine(12.97, 77.59, *donors[donor_id]), donor_id))
+            for chunk_size in (7, main.FETCH_CHUNK_SIZE):
+                with self.subTest(chunk_size=chunk_size), mock.patch.object(main, 'FETCH_CHUNK_SIZE', chunk_size):
+                    ranked, _ = rank(conn, 'T', 12.97, 77.59)
+                    self.assertEqual([donor_id for donor_id, _, _ in ranked], expected)
+
+    def test_no_donors(self):
+        with main.pool.acquire() as conn:
+            ranked, distances = rank(conn, 'none', 12.9, 77.6)
+        self.assertEqual(ranked, [])
+        self.assertEqual(len(distances), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()